@@ -1,8 +1,47 @@
+import time
 from pathlib import Path
+from typing import Literal, NamedTuple, Optional
 
 import aiosqlite
 
 
+class FileRecord(NamedTuple):
+    """
+    A row of the file table, as returned by :meth:`Database.list_files`.
+    """
+
+    id: str
+    name: str
+    legalized_name: str
+    size: int
+    uploaded_at: int
+
+
+def _prefix_upper_bound(prefix: str) -> Optional[str]:
+    """
+    Returns the smallest string greater than every string starting with `prefix`,
+    so a prefix match can be expressed as an indexable range.
+    Returns None if there is no such bound.
+    """
+    while prefix and ord(prefix[-1]) == 0x10FFFF:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    next_char = ord(prefix[-1]) + 1
+    # surrogates can't be encoded to UTF-8, and no stored string contains one
+    if 0xD800 <= next_char <= 0xDFFF:
+        next_char = 0xE000
+    return prefix[:-1] + chr(next_char)
+
+
+# sort key and direction of each list_files order
+_ORDER_KEYS = {
+    "uploaded_at": ("uploaded_at", "DESC"),
+    "name": ("name", "ASC"),
+    "size": ("CAST(size AS INTEGER)", "ASC"),
+}
+
+
 class Database:
     """
     The database class of the bot.
@@ -17,6 +56,14 @@ class Database:
         """
         Path(self.path).parent.mkdir(parents=True, exist_ok=True)
         async with aiosqlite.connect(self.path) as db:
+            # WAL lets listings read while add_file writes
+            # it has to be set outside a transaction, where it would silently do nothing
+            async with db.execute("PRAGMA journal_mode=WAL") as cursor:
+                (journal_mode,) = await cursor.fetchone()
+            if journal_mode.lower() != "wal":
+                raise RuntimeError(f"Could not enable WAL journal mode, got '{journal_mode}'.")
+            # one immediate transaction, so concurrent initializations run one after another
+            await db.execute("BEGIN IMMEDIATE")
             # create file mapping
             await db.execute(
                 """
@@ -25,10 +72,72 @@ class Database:
                     name TEXT,
                     legalized_name TEXT,
                     size TEXT,
-                    message_ids TEXT
+                    message_ids TEXT,
+                    uploaded_at INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            # databases created before the upload timestamp existed
+            async with db.execute("PRAGMA table_info(file)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if "uploaded_at" not in columns:
+                await db.execute("ALTER TABLE file ADD COLUMN uploaded_at INTEGER NOT NULL DEFAULT 0")
+            # indexes for list_files / get_files_stats, each one ordered by a listing sort key
+            # and covering the columns get_files_stats filters and sums on
+            # size is stored as TEXT, so it is indexed (and must be queried) as CAST(size AS INTEGER)
+            await db.execute("CREATE INDEX IF NOT EXISTS file_name ON file (name, id, size, uploaded_at)")
+            await db.execute("CREATE INDEX IF NOT EXISTS file_uploaded_at ON file (uploaded_at, id, size)")
+            await db.execute(
+                "CREATE INDEX IF NOT EXISTS file_size ON file (CAST(size AS INTEGER), id, size, uploaded_at)"
+            )
+            # running count and total size, for unfiltered get_files_stats
+            await db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 0),
+                    count INTEGER NOT NULL,
+                    total_size INTEGER NOT NULL
                 )
                 """
             )
+            await db.execute(
+                """
+                INSERT OR IGNORE INTO file_stats (id, count, total_size)
+                SELECT 0, COUNT(*), COALESCE(SUM(CAST(size AS INTEGER)), 0) FROM file
+                """
+            )
+            await db.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS file_stats_insert AFTER INSERT ON file
+                BEGIN
+                    UPDATE file_stats
+                    SET count = count + 1, total_size = total_size + CAST(NEW.size AS INTEGER)
+                    WHERE id = 0;
+                END
+                """
+            )
+            await db.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS file_stats_delete AFTER DELETE ON file
+                BEGIN
+                    UPDATE file_stats
+                    SET count = count - 1, total_size = total_size - CAST(OLD.size AS INTEGER)
+                    WHERE id = 0;
+                END
+                """
+            )
+            await db.execute(
+                """
+                CREATE TRIGGER IF NOT EXISTS file_stats_update AFTER UPDATE OF size ON file
+                BEGIN
+                    UPDATE file_stats
+                    SET total_size = total_size - CAST(OLD.size AS INTEGER) + CAST(NEW.size AS INTEGER)
+                    WHERE id = 0;
+                END
+                """
+            )
+            await db.commit()
+            await db.execute("PRAGMA optimize")
 
     async def add_file(
         self, id: str, name: str, legalized_name: str, size: int, message_ids: list[str]
@@ -39,10 +148,10 @@ class Database:
         async with aiosqlite.connect(self.path) as db:
             await db.execute(
                 """
-                INSERT INTO file (id, name, legalized_name, size, message_ids)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT INTO file (id, name, legalized_name, size, message_ids, uploaded_at)
+                VALUES (?, ?, ?, ?, ?, ?)
                 """,
-                (id, name, legalized_name, size, ",".join(message_ids)),
+                (id, name, legalized_name, size, ",".join(message_ids), int(time.time())),
             )
             await db.commit()
 
@@ -74,3 +183,145 @@ class Database:
                 (id,),
             )
             await db.commit()
+
+    @staticmethod
+    def _build_filter(
+        name_from: Optional[str] = None,
+        name_below: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        uploaded_after: Optional[int] = None,
+        uploaded_before: Optional[int] = None,
+    ) -> tuple[list[str], list]:
+        """
+        Builds the WHERE conditions shared by list_files and get_files_stats.
+
+        :return: The conditions and their parameters.
+        :rtype: tuple[list[str], list]
+        """
+        conditions: list[str] = []
+        params: list = []
+        for condition, value in (
+            ("name >= ?", name_from),
+            ("name < ?", name_below),
+            ("CAST(size AS INTEGER) >= ?", min_size),
+            ("CAST(size AS INTEGER) <= ?", max_size),
+            ("uploaded_at >= ?", uploaded_after),
+            ("uploaded_at < ?", uploaded_before),
+        ):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        return conditions, params
+
+    async def list_files(
+        self,
+        *,
+        order_by: Literal["uploaded_at", "name", "size"] = "uploaded_at",
+        name_prefix: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        uploaded_after: Optional[int] = None,
+        uploaded_before: Optional[int] = None,
+        limit: int = 100,
+        cursor: Optional[tuple] = None,
+    ) -> tuple[list[FileRecord], Optional[tuple]]:
+        """
+        Lists files in the database.
+
+        Files are ordered by `order_by`: upload time (newest first), name, or size (smallest first).
+        Each order is read from its own index, so a page costs O(limit) when the filters are on the order key
+        (`uploaded_after`/`uploaded_before`, `name_prefix` and `min_size`/`max_size` respectively).
+        A page with filters on other columns can cost up to O(files matching them),
+        so order by the key of the filter that matches the fewest files.
+
+        Name prefix matching is case-sensitive. Sizes are in bytes and upload times are unix timestamps.
+        `uploaded_after` is inclusive and `uploaded_before` is exclusive.
+
+        :param limit: The maximum number of files to return.
+        :param cursor: The cursor returned by the previous call with the same filters and order, to fetch the next page.
+        :return: The files and the cursor of the next page, or None if this is the last page.
+        :rtype: tuple[list[FileRecord], tuple | None]
+        """
+        if order_by not in _ORDER_KEYS:
+            raise ValueError(f"Invalid order '{order_by}'. Please use one of {', '.join(_ORDER_KEYS)}.")
+        if limit <= 0:
+            raise ValueError("limit must be positive.")
+        if cursor is not None and (len(cursor) != 3 or cursor[0] != order_by):
+            raise ValueError(f"The cursor does not belong to a listing ordered by '{order_by}'.")
+        key, order = _ORDER_KEYS[order_by]
+        name_from = name_prefix or None
+        name_below = _prefix_upper_bound(name_prefix) if name_prefix else None
+        # on ascending keys the cursor also tightens the lower bound of the sort key,
+        # so the index range starts at the cursor instead of at the first match
+        if cursor is not None and order_by == "name":
+            name_from = max(name_from, cursor[1]) if name_from is not None else cursor[1]
+        elif cursor is not None and order_by == "size":
+            min_size = max(min_size, cursor[1]) if min_size is not None else cursor[1]
+        conditions, params = self._build_filter(
+            name_from, name_below, min_size, max_size, uploaded_after, uploaded_before
+        )
+        if cursor is not None:
+            conditions.append(f"({key}, id) {'>' if order == 'ASC' else '<'} (?, ?)")
+            params.extend(cursor[1:])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        async with aiosqlite.connect(self.path) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute(
+                f"""
+                SELECT id, name, legalized_name, CAST(size AS INTEGER) AS size, uploaded_at FROM file
+                {where}
+                ORDER BY {key} {order}, id {order}
+                LIMIT ?
+                """,
+                (*params, limit + 1),
+            ) as db_cursor:
+                rows = await db_cursor.fetchall()
+        files = [
+            FileRecord(row["id"], row["name"], row["legalized_name"], row["size"], row["uploaded_at"])
+            for row in rows[:limit]
+        ]
+        next_cursor = None
+        if len(rows) > limit:
+            last = files[-1]
+            next_cursor = (order_by, getattr(last, order_by), last.id)
+        return files, next_cursor
+
+    async def get_files_stats(
+        self,
+        *,
+        name_prefix: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        uploaded_after: Optional[int] = None,
+        uploaded_before: Optional[int] = None,
+    ) -> tuple[int, int]:
+        """
+        Counts the files matching the filters and sums their sizes.
+        Takes the same filters as :meth:`list_files`.
+
+        The unfiltered stats are kept up to date by triggers and cost O(1).
+        Filtered stats are read from a covering index, but still cost O(matching files).
+
+        :return: The number of files and their total size in bytes.
+        :rtype: tuple[int, int]
+        """
+        conditions, params = self._build_filter(
+            name_prefix or None,
+            _prefix_upper_bound(name_prefix) if name_prefix else None,
+            min_size,
+            max_size,
+            uploaded_after,
+            uploaded_before,
+        )
+        if conditions:
+            query = f"""
+            SELECT COUNT(*), COALESCE(SUM(CAST(size AS INTEGER)), 0) FROM file
+            WHERE {' AND '.join(conditions)}
+            """
+        else:
+            query = "SELECT count, total_size FROM file_stats WHERE id = 0"
+        async with aiosqlite.connect(self.path) as db:
+            async with db.execute(query, params) as cursor:
+                count, total_size = await cursor.fetchone()
+                return count, total_size
@@ -0,0 +1,186 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from src.database import Database, _prefix_upper_bound
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def make_db(path, files):
+    """
+    Creates a database with `files` as (id, name, size, uploaded_at) rows.
+    """
+    db = Database(str(path))
+    await db.initialize()
+    for id, name, size, uploaded_at in files:
+        await db.add_file(id, name, name, size, ["1"])
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "UPDATE file SET uploaded_at = ? WHERE id = ?",
+            [(uploaded_at, id) for id, _, _, uploaded_at in files],
+        )
+    return db
+
+
+async def list_all(db: Database, limit: int, **filters):
+    files, cursor = await db.list_files(limit=limit, **filters)
+    pages = [files]
+    while cursor is not None:
+        files, cursor = await db.list_files(limit=limit, cursor=cursor, **filters)
+        pages.append(files)
+    return [f.id for page in pages for f in page]
+
+
+@pytest.mark.parametrize(
+    "prefix, bound",
+    [
+        ("abc", "abd"),
+        ("a\U0010ffff", "b"),
+        ("\U0010ffff", None),
+        ("a\ud7ff", "a\ue000"),
+    ],
+)
+def test_prefix_upper_bound(prefix, bound):
+    assert _prefix_upper_bound(prefix) == bound
+
+
+def test_prefix_bound_encodable(tmp_path):
+    async def main():
+        files = [("1", "a\ud7ff", 1, 1), ("2", "a", 1, 2), ("3", "a\ue000", 1, 3), ("4", "b", 1, 4)]
+        db = await make_db(tmp_path / "db.sqlite", files)
+        assert await list_all(db, 10, name_prefix="a\ud7ff") == ["1"]
+        assert await db.get_files_stats(name_prefix="a\ud7ff") == (1, 1)
+
+    run(main())
+
+
+def test_list_by_upload_time_with_ties(tmp_path):
+    files = [(f"{i:02}", f"f{i}", i, i // 3) for i in range(10)]
+
+    async def main():
+        db = await make_db(tmp_path / "db.sqlite", files)
+        expected = [id for id, *_ in sorted(files, key=lambda f: (f[3], f[0]), reverse=True)]
+        assert await list_all(db, 2) == expected
+        assert await list_all(db, 4, uploaded_after=1, uploaded_before=3) == ["08", "07", "06", "05", "04", "03"]
+
+    run(main())
+
+
+def test_list_by_name_and_size(tmp_path):
+    files = [("1", "ab", 30, 0), ("2", "abc", 10, 0), ("3", "ab", 20, 0), ("4", "b", 5, 0), ("5", "a", 20, 0)]
+
+    async def main():
+        db = await make_db(tmp_path / "db.sqlite", files)
+        assert await list_all(db, 1, order_by="name", name_prefix="ab") == ["1", "3", "2"]
+        assert await list_all(db, 1, order_by="name", name_prefix="ab", max_size=20) == ["3", "2"]
+        assert await list_all(db, 1, order_by="size", min_size=10, max_size=20) == ["2", "3", "5"]
+        assert await list_all(db, 1, order_by="size", name_prefix="ab") == ["2", "3", "1"]
+        # sizes are compared as numbers, not as the stored TEXT
+        assert await list_all(db, 10, order_by="size", min_size=6) == ["2", "3", "5", "1"]
+        # filters don't change the order
+        assert [f.id for f in (await db.list_files(min_size=1))[0]] == ["5", "4", "3", "2", "1"]
+
+    run(main())
+
+
+def test_cursor_must_match_order(tmp_path):
+    async def main():
+        db = await make_db(tmp_path / "db.sqlite", [("1", "a", 1, 0), ("2", "b", 2, 0)])
+        _, cursor = await db.list_files(order_by="name", limit=1)
+        assert cursor == ("name", "a", "1")
+        with pytest.raises(ValueError):
+            await db.list_files(order_by="size", cursor=cursor)
+        with pytest.raises(ValueError):
+            await db.list_files(cursor=("a", "1"))
+        with pytest.raises(ValueError):
+            await db.list_files(order_by="id")
+
+    run(main())
+
+
+def test_stats(tmp_path):
+    async def main():
+        db = await make_db(tmp_path / "db.sqlite", [("1", "a", 5, 0), ("2", "b", 10, 0), ("3", "ab", 100, 0)])
+        assert await db.get_files_stats() == (3, 115)
+        assert await db.get_files_stats(name_prefix="a") == (2, 105)
+        assert await db.get_files_stats(min_size=10) == (2, 110)
+        await db.delete_file("3")
+        assert await db.get_files_stats() == (2, 15)
+        # beyond float precision, both paths stay exact
+        await db.add_file("4", "c", "c", 2**60 + 1, ["1"])
+        assert await db.get_files_stats() == (3, 2**60 + 16)
+        assert await db.get_files_stats(name_prefix="c") == (1, 2**60 + 1)
+
+    run(main())
+
+
+def make_old_schema(path):
+    with sqlite3.connect(path) as conn:
+        conn.execute(
+            "CREATE TABLE file (id TEXT PRIMARY KEY, name TEXT, legalized_name TEXT, size TEXT, message_ids TEXT)"
+        )
+        conn.execute("INSERT INTO file VALUES ('old', 'old', 'old', 7, '1')")
+    conn.close()
+
+
+@pytest.mark.parametrize("old_schema", [False, True])
+def test_wal_after_first_initialize(tmp_path, old_schema):
+    path = tmp_path / "db.sqlite"
+    if old_schema:
+        make_old_schema(path)
+    run(Database(str(path)).initialize())
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    conn.close()
+
+
+def test_concurrent_initialize(tmp_path):
+    path = tmp_path / "db.sqlite"
+    make_old_schema(path)
+
+    async def main():
+        await asyncio.gather(*(Database(str(path)).initialize() for _ in range(4)))
+        assert await Database(str(path)).get_files_stats() == (1, 7)
+
+    run(main())
+
+
+def test_listing_does_not_block_writes(tmp_path):
+    path = tmp_path / "db.sqlite"
+
+    async def main():
+        db = await make_db(path, [("1", "a", 1, 0)])
+        # hold a read transaction open, as a long listing would
+        reader = sqlite3.connect(path)
+        reader.execute("BEGIN")
+        reader.execute("SELECT * FROM file").fetchall()
+        try:
+            await db.add_file("2", "b", "b", 2, ["1"])
+        finally:
+            reader.close()
+        assert await db.get_files_stats() == (2, 3)
+
+    run(main())
+
+
+def test_migrate_old_schema(tmp_path):
+    path = tmp_path / "db.sqlite"
+    make_old_schema(path)
+
+    async def main():
+        db = Database(str(path))
+        await db.initialize()
+        await db.initialize()
+        await db.add_file("new", "new", "new", 3, ["2"])
+        files, cursor = await db.list_files()
+        assert cursor is None
+        assert [(f.id, f.size) for f in files] == [("new", 3), ("old", 7)]
+        assert files[1].uploaded_at == 0 and files[0].uploaded_at > 0
+        assert await db.get_files_stats() == (2, 10)
+        assert await db.get_file("old") == ("old", "old", "7", ["1"])
+
+    run(main())